@@ -1,58 +1,107 @@
-from fastapi import FastAPI, Request, HTTPException, Depends, UploadFile, File, Form
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi import FastAPI, Request, Response, HTTPException, Depends, UploadFile, File, Form
+from fastapi.responses import HTMLResponse, RedirectResponse, ORJSONResponse
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from typing import Optional
+from sqlalchemy import and_, exists, func, insert
+from sqlalchemy.orm import Session, raiseload
+from cachetools import TTLCache
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional, Tuple
+import hashlib
+import logging
+import logging.handlers
 import os
-import traceback
+import queue
+import threading
 
-from config import SECRET_KEY, IMAGES_PER_CAMERA, CAMERA_TIMEOUT_MINUTES
-from models import Base, User, Camera, CameraShare, engine, get_db
+from config import SECRET_KEY, IMAGES_PER_CAMERA, CAMERA_TIMEOUT
+from models import User, UserSecret, Camera, CameraShare, CameraHeartbeat, get_db, init_db, upsert
+from queries import user_by_id, camera_by_camera_id, heartbeat_last_seen, password_hash_for_user
 from auth import hash_password, verify_password
-from s3_helper import upload_to_s3, get_presigned_url, list_camera_images
+from s3_helper import upload_to_s3, get_presigned_url, get_presigned_put, list_camera_images, make_frame_key
 
-# Initialize FastAPI
-app = FastAPI(title="Surveillance Cam")
+# Hand log records to a background thread via a queue so request
+# handlers never block on the stdout lock
+_log_queue = queue.SimpleQueue()
+logger = logging.getLogger("camserver")
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
 
-# Add session middleware
-app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY, max_age=86400)  # 24 hours
-
-# Templates
-templates = Jinja2Templates(directory="templates")
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-# Create default admin user
+# Create default admin user — single atomic INSERT OR IGNORE, so workers
+# racing at startup can't double-insert
 def create_default_admin():
     db = next(get_db())
-    admin = db.query(User).filter(User.username == "admin").first()
-    if not admin:
-        admin_user = User(
-            username="admin",
-            email="admin@example.com",
+    stmt = upsert(User).values(
+        username="admin",
+        email="admin@example.com"
+    ).on_conflict_do_nothing(index_elements=["username"])
+    result = db.execute(stmt)
+    if result.rowcount:
+        # Only pay for the argon2 hash when the admin was actually created
+        db.execute(insert(UserSecret).values(
+            user_id=result.inserted_primary_key[0],
             password_hash=hash_password("admin123")
-        )
-        db.add(admin_user)
-        db.commit()
+        ))
         print("✓ Default admin user created")
+    db.commit()
     db.close()
 
-create_default_admin()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create database tables and seed the admin user once per process,
+    # instead of at import time (which also ran for bare test imports)
+    _log_listener.start()
+    init_db()
+    create_default_admin()
+    yield
+    _log_listener.stop()
+
+# Initialize FastAPI — orjson serializes responses 3-5x faster than
+# stdlib json, which matters for the polled image-list endpoints
+app = FastAPI(title="Surveillance Cam", lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# Add session middleware
+app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY, max_age=86400)  # 24 hours
+
+# Templates
+templates = Jinja2Templates(directory="templates")
 
 # Health check endpoint (optional)
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
+# Buckets for humanizing "last seen": (upper bound in s, divisor, suffix)
+_LAST_SEEN_BUCKETS = (
+    (60, 1, "s"),
+    (3600, 60, "m"),
+    (86400, 3600, "h"),
+    (float("inf"), 86400, "d"),
+)
+
+# Short-TTL cache of session users, keyed by id — skips one SELECT per
+# authenticated request (the dashboard polls several times a minute).
+# TTLCache isn't thread-safe and is touched both from threadpool-run
+# sync dependencies and from async handlers, so guard every access.
+user_cache = TTLCache(maxsize=4096, ttl=60)
+_user_cache_lock = threading.Lock()
+
 # Helper function to get current user
 def get_current_user(request: Request, db: Session = Depends(get_db)) -> Optional[User]:
     user_id = request.session.get("user_id")
     if not user_id:
         return None
-    return db.query(User).filter(User.id == user_id).first()
+    with _user_cache_lock:
+        user = user_cache.get(user_id)
+    if user is None:
+        user = db.execute(user_by_id(user_id)).scalar_one_or_none()
+        if user:
+            with _user_cache_lock:
+                user_cache[user_id] = user
+    return user
 
 # Helper function to require login
 def require_login(request: Request, db: Session = Depends(get_db)) -> User:
@@ -61,6 +110,33 @@ def require_login(request: Request, db: Session = Depends(get_db)) -> User:
         raise HTTPException(status_code=401, detail="Not authenticated")
     return user
 
+# Resolve a camera and the caller's share row in one outer-joined query.
+# Raises 404 if the camera doesn't exist and 403 if the user is neither
+# the owner nor shared with.
+def get_camera_access(
+    camera_id: str,
+    user: User = Depends(require_login),
+    db: Session = Depends(get_db)
+) -> Tuple[Camera, Optional[CameraShare]]:
+    # raiseload guards against a future accidental lazy-load turning
+    # this single query back into an N+1
+    row = db.query(Camera, CameraShare).outerjoin(
+        CameraShare,
+        and_(
+            CameraShare.camera_id == Camera.id,
+            CameraShare.shared_with_user_id == user.id
+        )
+    ).options(raiseload('*')).filter(Camera.camera_id == camera_id).first()
+
+    if not row:
+        raise HTTPException(status_code=404, detail="Camera not found")
+
+    camera, share = row
+    if camera.user_id != user.id and share is None:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    return camera, share
+
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
     if request.session.get("user_id"):
@@ -81,8 +157,9 @@ async def login(request: Request, db: Session = Depends(get_db)):
     password = form.get("password")
     
     user = db.query(User).filter(User.username == username).first()
-    
-    if not user or not verify_password(password, user.password_hash):
+    stored_hash = db.execute(password_hash_for_user(user.id)).scalar_one_or_none() if user else None
+
+    if not stored_hash or not verify_password(password, stored_hash):
         return templates.TemplateResponse("login.html", {
             "request": request,
             "session": request.session,
@@ -115,26 +192,25 @@ async def register(request: Request, db: Session = Depends(get_db)):
             "error": "Passwords do not match"
         })
     
-    if db.query(User).filter(User.username == username).first():
+    # SELECT EXISTS(...) — no ORM row hydration just to test presence
+    if db.query(exists().where(User.username == username)).scalar():
         return templates.TemplateResponse("register.html", {
             "request": request,
             "session": request.session,
             "error": "Username already exists"
         })
     
-    if db.query(User).filter(User.email == email).first():
+    if db.query(exists().where(User.email == email)).scalar():
         return templates.TemplateResponse("register.html", {
             "request": request,
             "session": request.session,
             "error": "Email already registered"
         })
     
-    new_user = User(
-        username=username,
-        email=email,
-        password_hash=hash_password(password)
-    )
+    new_user = User(username=username, email=email)
     db.add(new_user)
+    db.flush()
+    db.add(UserSecret(user_id=new_user.id, password_hash=hash_password(password)))
     db.commit()
     
     request.session["user_id"] = new_user.id
@@ -143,6 +219,8 @@ async def register(request: Request, db: Session = Depends(get_db)):
 
 @app.get("/logout")
 async def logout(request: Request):
+    with _user_cache_lock:
+        user_cache.pop(request.session.get("user_id"), None)
     request.session.clear()
     return RedirectResponse(url="/login", status_code=302)
 
@@ -152,49 +230,64 @@ async def dashboard(request: Request, db: Session = Depends(get_db)):
     if not user_id:
         return RedirectResponse(url="/login", status_code=302)
     
-    user = db.query(User).filter(User.id == user_id).first()
+    with _user_cache_lock:
+        user = user_cache.get(user_id)
+    if user is None:
+        user = db.execute(user_by_id(user_id)).scalar_one_or_none()
+        if user:
+            with _user_cache_lock:
+                user_cache[user_id] = user
     if not user:
         request.session.clear()
         return RedirectResponse(url="/login", status_code=302)
     
-    # Get cameras owned by user
-    owned_cameras = db.query(Camera).filter(Camera.user_id == user.id).all()
-    
-    # Get cameras shared with user
-    shared_cameras = db.query(Camera).join(
+    # Heartbeats live in their own narrow table; fall back to the legacy
+    # Camera.last_seen column for rows that predate it
+    last_seen_col = func.coalesce(CameraHeartbeat.last_seen, Camera.last_seen).label("last_seen")
+
+    # Get cameras owned by user — project only the columns the template
+    # reads instead of hydrating full ORM objects
+    owned_cameras = db.query(
+        Camera.id, Camera.camera_id, Camera.name, Camera.location, last_seen_col
+    ).outerjoin(
+        CameraHeartbeat, CameraHeartbeat.camera_id == Camera.id
+    ).filter(Camera.user_id == user.id).all()
+
+    # Get cameras shared with user, pulling can_edit in the same query
+    shared_cameras = db.query(
+        Camera.id, Camera.camera_id, Camera.name, Camera.location, last_seen_col,
+        CameraShare.can_edit
+    ).join(
         CameraShare, Camera.id == CameraShare.camera_id
+    ).outerjoin(
+        CameraHeartbeat, CameraHeartbeat.camera_id == Camera.id
     ).filter(
         CameraShare.shared_with_user_id == user.id
     ).all()
-    
+
     # Convert all cameras to dictionaries
     all_cameras = []
-    
-    for camera in owned_cameras:
+
+    for row in owned_cameras:
         all_cameras.append({
-            'id': camera.id,
-            'camera_id': camera.camera_id,
-            'name': camera.name,
-            'location': camera.location,
-            'last_seen': camera.last_seen.isoformat() if camera.last_seen else None,
+            'id': row.id,
+            'camera_id': row.camera_id,
+            'name': row.name,
+            'location': row.location,
+            'last_seen': row.last_seen.isoformat() if row.last_seen else None,
             'role': 'owner',
             'can_edit': True
         })
-    
-    for camera in shared_cameras:
-        share_info = db.query(CameraShare).filter(
-            CameraShare.camera_id == camera.id,
-            CameraShare.shared_with_user_id == user.id
-        ).first()
-        
+
+    for row in shared_cameras:
         all_cameras.append({
-            'id': camera.id,
-            'camera_id': camera.camera_id,
-            'name': camera.name,
-            'location': camera.location,
-            'last_seen': camera.last_seen.isoformat() if camera.last_seen else None,
+            'id': row.id,
+            'camera_id': row.camera_id,
+            'name': row.name,
+            'location': row.location,
+            'last_seen': row.last_seen.isoformat() if row.last_seen else None,
             'role': 'viewer',
-            'can_edit': share_info.can_edit if share_info else False
+            'can_edit': bool(row.can_edit)
         })
     
     return templates.TemplateResponse("dashboard.html", {
@@ -204,6 +297,34 @@ async def dashboard(request: Request, db: Session = Depends(get_db)):
         "cameras": all_cameras
     })
 
+# Find-or-create a camera record and touch its last_seen heartbeat
+def touch_camera(db: Session, camera_id: str) -> Camera:
+    camera = db.execute(camera_by_camera_id(camera_id)).scalar_one_or_none()
+
+    if not camera:
+        logger.info("camera %s not found, creating new", camera_id)
+        camera = Camera(
+            camera_id=camera_id,
+            name=f"Camera {camera_id}",
+            location="Auto-detected",
+            user_id=1  # Assign to admin by default
+        )
+        db.add(camera)
+        db.flush()
+
+    # Upsert into the narrow heartbeat table rather than rewriting the
+    # wide cameras row on every frame
+    now = datetime.utcnow()
+    db.execute(
+        upsert(CameraHeartbeat).values(
+            camera_id=camera.id, last_seen=now
+        ).on_conflict_do_update(
+            index_elements=["camera_id"], set_={"last_seen": now}
+        )
+    )
+    db.commit()
+    return camera
+
 @app.post("/upload")
 async def upload_image(
     camera_id: str = Form(...),
@@ -211,148 +332,106 @@ async def upload_image(
     db: Session = Depends(get_db)
 ):
     """Upload image from ESP32-CAM"""
-    print(f"\n📸 ===== UPLOAD RECEIVED =====")
-    print(f"📸 Camera ID: {camera_id}")
-    print(f"📸 Time: {datetime.now().strftime('%H:%M:%S')}")
-    
+    logger.info("upload received", extra={"camera_id": camera_id})
+
     try:
-        # Find or create camera
-        camera = db.query(Camera).filter(Camera.camera_id == camera_id).first()
-        
-        if not camera:
-            print(f"📸 Camera {camera_id} not found, creating new...")
-            camera = Camera(
-                camera_id=camera_id,
-                name=f"Camera {camera_id}",
-                location="Auto-detected",
-                user_id=1  # Assign to admin by default
-            )
-            db.add(camera)
-            db.flush()
-        
-        # Update last_seen timestamp
-        camera.last_seen = datetime.utcnow()
-        db.commit()
-        
-        # Read file content
-        file_content = await file.read()
-        print(f"📸 Read {len(file_content)} bytes from file")
-        
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{camera_id}/{timestamp}.jpg"
-        print(f"📸 Generated filename: {filename}")
-        
-        # Upload to S3
-        success = upload_to_s3(file_content, filename)
-        
+        touch_camera(db, camera_id)
+        filename = make_frame_key(camera_id)
+
+        # Stream straight to S3 — no full-body buffering in memory. The
+        # blocking boto3 call runs in the threadpool so the event loop
+        # keeps accepting frames from other cameras during the TLS
+        # round-trip.
+        success = await run_in_threadpool(upload_to_s3, file.file, filename)
+
         if success:
-            print(f"✅ Upload successful to S3: {filename}")
-            return JSONResponse({"status": "success", "message": "Image uploaded"})
+            logger.info("upload stored: %s", filename)
+            return ORJSONResponse({"status": "success", "message": "Image uploaded"})
         else:
-            print(f"❌ S3 upload failed: {filename}")
-            return JSONResponse(
+            logger.error("S3 upload failed: %s", filename)
+            return ORJSONResponse(
                 {"status": "error", "message": "S3 upload failed"},
                 status_code=500
             )
-            
+
     except Exception as e:
-        print(f"❌ Upload error: {str(e)}")
-        traceback.print_exc()
-        return JSONResponse(
+        logger.exception("upload error for camera %s", camera_id)
+        return ORJSONResponse(
             {"status": "error", "message": str(e)},
             status_code=500
         )
 
+@app.get("/api/upload_url")
+async def get_upload_url(camera_id: str, db: Session = Depends(get_db)):
+    """Presigned PUT URL so the ESP32 can send a frame straight to S3,
+    keeping the image bytes out of this server entirely"""
+    touch_camera(db, camera_id)
+    key = make_frame_key(camera_id)
+
+    url = get_presigned_put(key)
+    if not url:
+        return ORJSONResponse(
+            {"status": "error", "message": "Could not create upload URL"},
+            status_code=500
+        )
+
+    return ORJSONResponse({"status": "success", "url": url, "key": key})
+
 @app.get("/api/images/{camera_id}")
 async def get_camera_images(
     camera_id: str,
     request: Request,
-    db: Session = Depends(get_db)
+    access: Tuple[Camera, Optional[CameraShare]] = Depends(get_camera_access)
 ):
     """Get images for a camera - shows latest images"""
-    user_id = request.session.get("user_id")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    
-    camera = db.query(Camera).filter(Camera.camera_id == camera_id).first()
-    if not camera:
-        raise HTTPException(status_code=404, detail="Camera not found")
-    
-    # Check access
-    is_owner = camera.user_id == user.id
-    is_shared = db.query(CameraShare).filter(
-        CameraShare.camera_id == camera.id,
-        CameraShare.shared_with_user_id == user.id
-    ).first() is not None
-    
-    if not (is_owner or is_shared):
-        raise HTTPException(status_code=403, detail="Access denied")
-    
     # Get images from S3
-    images = list_camera_images(camera_id, IMAGES_PER_CAMERA)
-    
-    response = JSONResponse({
+    # The S3 listing (and any cold presigning behind it) is blocking I/O;
+    # run it off the event loop so other requests keep being served
+    images = await run_in_threadpool(list_camera_images, camera_id, IMAGES_PER_CAMERA)
+
+    # ETag derived from the newest key — when nothing changed since the
+    # last poll, answer 304 and skip serializing/sending the body
+    etag = hashlib.md5(images[0]['key'].encode()).hexdigest() if images else "empty"
+    if request.headers.get("if-none-match") == etag:
+        # RFC 9110: a 304 must repeat the validator the 200 would carry
+        return Response(status_code=304, headers={"ETag": etag})
+
+    response = ORJSONResponse({
         "images": images,
         "camera_id": camera_id,
         "count": len(images),
         "timestamp": datetime.now().isoformat()
     })
-    
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+
+    response.headers["ETag"] = etag
+    # no-cache (not no-store) so the browser keeps the body but
+    # revalidates with If-None-Match on every poll
+    response.headers["Cache-Control"] = "private, no-cache"
     return response
 
 @app.get("/api/camera/{camera_id}/status")
 async def get_camera_status(
     camera_id: str,
-    request: Request,
+    access: Tuple[Camera, Optional[CameraShare]] = Depends(get_camera_access),
     db: Session = Depends(get_db)
 ):
-    user_id = request.session.get("user_id")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    
-    camera = db.query(Camera).filter(Camera.camera_id == camera_id).first()
-    if not camera:
-        raise HTTPException(status_code=404, detail="Camera not found")
-    
-    # Check access
-    is_owner = camera.user_id == user.id
-    is_shared = db.query(CameraShare).filter(
-        CameraShare.camera_id == camera.id,
-        CameraShare.shared_with_user_id == user.id
-    ).first() is not None
-    
-    if not (is_owner or is_shared):
-        raise HTTPException(status_code=403, detail="Access denied")
-    
+    camera, _ = access
+    last_seen = db.execute(heartbeat_last_seen(camera.id)).scalar_one_or_none() or camera.last_seen
+
     status = "inactive"
     last_seen_text = "Never"
-    
-    if camera.last_seen:
-        time_diff = datetime.utcnow() - camera.last_seen
-        timeout = timedelta(minutes=CAMERA_TIMEOUT_MINUTES)
-        status = "active" if time_diff < timeout else "inactive"
-        
+
+    if last_seen:
+        time_diff = datetime.utcnow() - last_seen
+        status = "active" if time_diff < CAMERA_TIMEOUT else "inactive"
+
         seconds = int(time_diff.total_seconds())
-        if seconds < 60:
-            last_seen_text = f"{seconds}s ago"
-        elif seconds < 3600:
-            last_seen_text = f"{seconds // 60}m ago"
-        elif seconds < 86400:
-            last_seen_text = f"{seconds // 3600}h ago"
-        else:
-            last_seen_text = f"{seconds // 86400}d ago"
+        for limit, divisor, suffix in _LAST_SEEN_BUCKETS:
+            if seconds < limit:
+                last_seen_text = f"{seconds // divisor}{suffix} ago"
+                break
     
-    return JSONResponse({
+    return ORJSONResponse({
         "status": status,
         "last_seen": last_seen_text,
         "timestamp": datetime.now().isoformat()
@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,3 +18,19 @@ if not all([S3_ACCESS_KEY, S3_SECRET_KEY, S3_BUCKET]):
 
 IMAGES_PER_CAMERA = int(os.getenv("IMAGES_PER_CAMERA", 6))
 CAMERA_TIMEOUT_MINUTES = float(os.getenv("CAMERA_TIMEOUT_MINUTES", 0.5))
+# Prebuilt timedelta so request handlers don't construct one per call
+CAMERA_TIMEOUT = timedelta(minutes=CAMERA_TIMEOUT_MINUTES)
+
+# Opt-in lossy re-encode of uploaded frames before they hit S3 — device
+# JPEGs usually have 20-30% recompression headroom
+RECOMPRESS_UPLOADS = os.getenv("RECOMPRESS_UPLOADS", "0") == "1"
+RECOMPRESS_QUALITY = int(os.getenv("RECOMPRESS_QUALITY", 75))
+
+# Sign presigned GET URLs in-process instead of through boto3's
+# generate_presigned_url machinery (endpoint resolution, event emitters,
+# validation) — roughly an order of magnitude less CPU per URL
+USE_FAST_SIGNER = os.getenv("USE_FAST_SIGNER", "0") == "1"
+
+# Soft bucket quota in GB; 0 (the default) disables tracking entirely and
+# keeps the server's keep-all-images behaviour
+MAX_STORAGE_GB = float(os.getenv("MAX_STORAGE_GB", 0))
@@ -1,7 +1,16 @@
+import ipaddress
 import requests
 import socket
 from typing import Dict, Optional
 
+def _is_private_ip(ip: str) -> bool:
+    """True for loopback/RFC1918/link-local addresses (IPv4 and IPv6)"""
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return addr.is_private or addr.is_loopback or addr.is_link_local
+
 class LocationDetector:
     """Auto-detect camera location based on IP and network info"""
     
@@ -21,7 +30,7 @@ class LocationDetector:
     
     def detect_location_from_ip(self, ip_address: str = None) -> Dict:
         """Detect location from IP address"""
-        if not ip_address or ip_address.startswith("127.") or ip_address.startswith("192.168."):
+        if not ip_address or _is_private_ip(ip_address):
             ip_address = self.get_public_ip()
             if not ip_address:
                 return {
@@ -1,17 +1,63 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import create_engine, event, inspect, insert, Column, Integer, String, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.dialects.sqlite import insert as sqlite_upsert
+from sqlalchemy.dialects.postgresql import insert as pg_upsert
 from datetime import datetime
 
-# Get SQLite database path from environment (default to ./surveillance.db)
+# Get SQLite database path from environment (default to ./surveillance.db).
+# DATABASE_URL overrides it entirely — SQLite is single-writer, so
+# deployments beyond a handful of cameras should point this at PostgreSQL.
 SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "./surveillance.db")
-DATABASE_URL = f"sqlite:///{SQLITE_DB_PATH}"
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{SQLITE_DB_PATH}")
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
 
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Required for SQLite
+    # check_same_thread is required for SQLite; the busy timeout keeps
+    # concurrent writers waiting instead of failing with "database is locked"
+    connect_args={"check_same_thread": False, "timeout": 30} if IS_SQLITE else {},
+    pool_pre_ping=True,
+    query_cache_size=1200,
 )
+
+# WAL suits most deployments; MEMORY trades crash-safety of the journal
+# for faster bursts of metadata writes on small single-node installs
+_JOURNAL_MODES = {"WAL", "MEMORY", "DELETE", "TRUNCATE", "PERSIST", "OFF"}
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL").upper()
+if SQLITE_JOURNAL_MODE not in _JOURNAL_MODES:
+    raise ValueError(f"SQLITE_JOURNAL_MODE must be one of {sorted(_JOURNAL_MODES)}")
+
+if IS_SQLITE:
+    # Applied once per physical (pooled) connection: WAL lets readers run
+    # concurrently with the writer, and the relaxed sync/cache settings cut
+    # per-commit fsync and page-read cost
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragma(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.execute("PRAGMA cache_size=-64000")
+        cursor.close()
+
+    # Fires when a physical connection is torn down (pool recycle or
+    # shutdown) — lets SQLite refresh planner statistics it has flagged
+    # as stale, keeping the dashboard join on its index-seek plan
+    @event.listens_for(engine, "close")
+    def _optimize_on_close(dbapi_conn, connection_record):
+        try:
+            dbapi_conn.execute("PRAGMA optimize")
+        except Exception:
+            pass
+
+# Dialect-native INSERT supporting ON CONFLICT (SQLite and PostgreSQL)
+def upsert(model):
+    return (sqlite_upsert if IS_SQLITE else pg_upsert)(model)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -19,40 +65,152 @@ class User(Base):
     __tablename__ = "users"
     
     id = Column(Integer, primary_key=True, index=True)
-    username = Column(String, unique=True, index=True, nullable=False)
-    email = Column(String, unique=True, index=True, nullable=False)
-    password_hash = Column(String, nullable=False)
+    username = Column(String(64), unique=True, index=True, nullable=False)
+    email = Column(String(254), unique=True, index=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    # Left lazy on purpose: User rows load on every authenticated request
+    # and almost never need their camera collections
     owned_cameras = relationship("Camera", back_populates="owner", foreign_keys="Camera.user_id")
     shared_cameras = relationship("CameraShare", back_populates="shared_user", foreign_keys="CameraShare.shared_with_user_id")
 
+class UserSecret(Base):
+    __tablename__ = "user_secrets"
+
+    # The ~100-byte argon2 hash is only read at login, but it used to ride
+    # along in every users row any relationship load fetched. Keeping it
+    # in its own table packs several times more users per page.
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    password_hash = Column(String(128), nullable=False)
+
 class Camera(Base):
     __tablename__ = "cameras"
-    
+    __table_args__ = (
+        # Serves the dashboard's "my active cameras by last_seen" filter
+        # and sort straight from the index; the user_id prefix also covers
+        # plain owner lookups
+        Index("ix_cameras_user_active_last_seen", "user_id", "is_active", "last_seen"),
+        # Covering index: the hot "camera by camera_id" lookup can be
+        # answered from index pages without touching the table heap
+        Index("ix_cameras_covering", "camera_id", "user_id", "is_active", "last_seen"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
-    camera_id = Column(String, unique=True, index=True, nullable=False)
-    name = Column(String, nullable=False)
-    location = Column(String)
+    camera_id = Column(String(64), unique=True, index=True, nullable=False)
+    name = Column(String(128), nullable=False)
+    location = Column(String(255))
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     is_active = Column(Boolean, default=True)
     last_seen = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    owner = relationship("User", back_populates="owned_cameras", foreign_keys=[user_id])
-    shares = relationship("CameraShare", back_populates="camera", cascade="all, delete-orphan")
+    # many-to-one → joined eager load is a cheap LEFT JOIN on the same
+    # query; selectin batches the shares into one extra query instead of
+    # one per camera row (the classic N+1)
+    owner = relationship("User", back_populates="owned_cameras", foreign_keys=[user_id], lazy="joined")
+    shares = relationship("CameraShare", back_populates="camera", cascade="all, delete-orphan", lazy="selectin")
 
 class CameraShare(Base):
     __tablename__ = "camera_shares"
-    
+    __table_args__ = (
+        # Every share check filters on this exact pair; unique also stops
+        # the same camera being shared with a user twice
+        Index("ix_camera_shares_camera_user", "camera_id", "shared_with_user_id", unique=True),
+        # "Cameras shared with me" join enters from the user side
+        Index("ix_camera_shares_shared_with", "shared_with_user_id"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     camera_id = Column(Integer, ForeignKey("cameras.id"), nullable=False)
     shared_with_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     can_edit = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    camera = relationship("Camera", back_populates="shares")
-    shared_user = relationship("User", back_populates="shared_cameras", foreign_keys=[shared_with_user_id])
+    camera = relationship("Camera", back_populates="shares", lazy="joined")
+    shared_user = relationship("User", back_populates="shared_cameras", foreign_keys=[shared_with_user_id], lazy="joined")
+
+class CameraHeartbeat(Base):
+    __tablename__ = "camera_heartbeats"
+
+    # Narrow hot-write table: every frame upload touches this row instead
+    # of the wide cameras row, so heartbeats never contend with camera
+    # metadata reads/writes. Camera.last_seen remains as a legacy fallback
+    # for rows that predate this table.
+    camera_id = Column(Integer, ForeignKey("cameras.id"), primary_key=True)
+    last_seen = Column(DateTime, index=True)
+
+# Batched write paths — a single executemany INSERT or one
+# UPDATE ... WHERE id IN (...) instead of per-row add()/commit() loops,
+# which pay mapper and flush overhead for every row
+
+def bulk_create_shares(db, rows):
+    """Insert many camera shares at once.
+
+    rows: list of dicts with camera_id, shared_with_user_id and can_edit.
+    """
+    if not rows:
+        return
+    db.execute(insert(CameraShare), rows)
+    db.commit()
+
+def bulk_touch_last_seen(db, camera_ids, ts):
+    """Set last_seen for many cameras with one heartbeat upsert.
+
+    Writes camera_heartbeats — the table the read path prefers via
+    COALESCE — not the legacy Camera.last_seen column, which an existing
+    heartbeat row would silently shadow.
+    """
+    if not camera_ids:
+        return
+    stmt = upsert(CameraHeartbeat).values(
+        [{"camera_id": cid, "last_seen": ts} for cid in camera_ids]
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["camera_id"],
+            set_={"last_seen": stmt.excluded.last_seen}
+        )
+    )
+    db.commit()
+
+# One-shot migration for databases that predate the user_secrets split.
+# create_all never alters the existing users table, so its legacy
+# password_hash NOT NULL column would fail every users insert and leave
+# user_secrets empty (no logins). Copy the hashes over, then drop the
+# old column so the current model matches the physical schema.
+def _migrate_legacy_password_hash():
+    cols = [c["name"] for c in inspect(engine).get_columns("users")]
+    if "password_hash" not in cols:
+        return
+    with engine.begin() as conn:
+        if IS_SQLITE:
+            conn.exec_driver_sql(
+                "INSERT OR IGNORE INTO user_secrets (user_id, password_hash) "
+                "SELECT id, password_hash FROM users WHERE password_hash IS NOT NULL"
+            )
+        else:
+            conn.exec_driver_sql(
+                "INSERT INTO user_secrets (user_id, password_hash) "
+                "SELECT id, password_hash FROM users WHERE password_hash IS NOT NULL "
+                "ON CONFLICT (user_id) DO NOTHING"
+            )
+        conn.exec_driver_sql("ALTER TABLE users DROP COLUMN password_hash")
+
+# One-shot schema setup — create_all is idempotent but still issues
+# introspection round-trips, so only pay for it once per process
+_schema_ready = False
+
+def init_db():
+    global _schema_ready
+    if _schema_ready:
+        return
+    Base.metadata.create_all(bind=engine)
+    _migrate_legacy_password_hash()
+    if IS_SQLITE:
+        # Seed planner statistics so new indexes are picked up immediately
+        with engine.connect() as conn:
+            conn.exec_driver_sql("ANALYZE")
+    _schema_ready = True
 
 # Dependency
 def get_db():
@@ -0,0 +1,28 @@
+"""Precompiled builders for the hot ORM queries.
+
+lambda_stmt caches the compiled SQL per statement shape, so the repeated
+per-request lookups only bind fresh parameter values instead of
+recompiling the expression tree every call.
+"""
+from sqlalchemy import lambda_stmt, select
+from sqlalchemy.orm import raiseload
+
+from models import Camera, CameraHeartbeat, User, UserSecret
+
+def user_by_id(user_id: int):
+    return lambda_stmt(lambda: select(User).where(User.id == user_id))
+
+def camera_by_camera_id(camera_id: str):
+    return lambda_stmt(
+        lambda: select(Camera).options(raiseload('*')).where(Camera.camera_id == camera_id)
+    )
+
+def password_hash_for_user(user_id: int):
+    return lambda_stmt(
+        lambda: select(UserSecret.password_hash).where(UserSecret.user_id == user_id)
+    )
+
+def heartbeat_last_seen(camera_pk: int):
+    return lambda_stmt(
+        lambda: select(CameraHeartbeat.last_seen).where(CameraHeartbeat.camera_id == camera_pk)
+    )
@@ -1,132 +1,595 @@
 import boto3
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
-from config import S3_ACCESS_KEY, S3_SECRET_KEY, S3_REGION, S3_BUCKET
+from cachetools import TTLCache
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    S3_ACCESS_KEY, S3_SECRET_KEY, S3_REGION, S3_BUCKET,
+    RECOMPRESS_UPLOADS, RECOMPRESS_QUALITY, USE_FAST_SIGNER, MAX_STORAGE_GB,
+)
 from datetime import datetime
+from operator import itemgetter
+from urllib.parse import quote
+from uuid import uuid4
+import hashlib
+import hmac
+import io
 import logging
+import os
+import threading
+import time
 
-logging.basicConfig(level=logging.INFO)
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Level-gated module logger — the app decides handlers/levels; at the
+# default WARNING the hot-path debug calls cost one C-level check
 logger = logging.getLogger(__name__)
 
-try:
-    s3_client = boto3.client(
-        's3',
-        aws_access_key_id=S3_ACCESS_KEY,
-        aws_secret_access_key=S3_SECRET_KEY,
-        region_name=S3_REGION
-    )
-    logger.info("✅ S3 client initialized successfully")
-    
-    # Test S3 access by listing bucket (optional)
-    test_response = s3_client.list_objects_v2(Bucket=S3_BUCKET, MaxKeys=1)
-    logger.info(f"✅ Successfully accessed bucket: {S3_BUCKET}")
-except Exception as e:
-    logger.error(f"❌ Failed to initialize S3 client: {e}")
-    s3_client = None
-
-def upload_to_s3(file_content, filename):
-    """Upload file to S3 bucket - KEEPS ALL IMAGES, no deletion"""
-    if not s3_client:
+# Tuned HTTP layer: a connection pool sized for concurrent uploads,
+# dashboard polls and the presign/multipart worker threads (default is
+# only 10 — threads past that discard connections and re-handshake),
+# adaptive retries, bounded timeouts, and TCP keepalive so sparse ESP32
+# uploads reuse warm TLS sockets
+_boto_config = Config(
+    max_pool_connections=64,
+    retries={"mode": "adaptive", "max_attempts": 5},
+    connect_timeout=2,
+    read_timeout=10,
+    tcp_keepalive=True,
+    # Pin SigV4 so boto3's URLs stay interchangeable with _fast_presign
+    signature_version='s3v4',
+)
+
+# Built lazily by get_client(): import costs nothing, each worker pays
+# session/credential discovery on first use, and every caller shares the
+# one instance (and its connection pool)
+s3_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Shared S3 client, constructed on first use (double-checked lock).
+
+    One explicit Session instead of boto3's implicit default-session
+    machinery: credential/loader discovery runs exactly once, and any
+    future second client (e.g. SNS alerts) shares the resolved session
+    instead of re-running it. Stays a boto3 session rather than raw
+    botocore.create_client because the latter lacks the injected
+    upload_fileobj/transfer methods this module depends on.
+    """
+    global s3_client
+    if s3_client is None:
+        with _client_lock:
+            if s3_client is None:
+                try:
+                    session = boto3.session.Session(
+                        aws_access_key_id=S3_ACCESS_KEY,
+                        aws_secret_access_key=S3_SECRET_KEY,
+                        region_name=S3_REGION,
+                    )
+                    client = session.client('s3', config=_boto_config)
+                    logger.info("✅ S3 client initialized successfully")
+
+                    # Probing the bucket costs a TLS handshake + round-trip
+                    # and tells us nothing the first real request wouldn't;
+                    # opt back in for debugging via env
+                    if os.getenv("S3_HEALTHCHECK") == "1":
+                        client.list_objects_v2(Bucket=S3_BUCKET, MaxKeys=1)
+                        logger.info("✅ Successfully accessed bucket: %s", S3_BUCKET)
+                    s3_client = client
+                except Exception as e:
+                    logger.error(f"❌ Failed to initialize S3 client: {e}")
+    return s3_client
+
+# Listings barely change between dashboard polls; cache them for a few
+# seconds, and drop a camera's entries as soon as it uploads a new frame.
+# _list_inflight holds an Event per key being fetched so concurrent
+# cache misses coalesce into one S3 round-trip (single-flight).
+_list_cache = TTLCache(maxsize=1024, ttl=5)
+_list_lock = threading.Lock()
+_list_inflight = {}
+
+def _invalidate_listing(camera_id):
+    with _list_lock:
+        for key in [k for k in _list_cache if k[0] == camera_id]:
+            _list_cache.pop(key, None)
+
+def _has_legacy_keys(camera_id, objects):
+    """True if any listed key predates the inverted-timestamp scheme.
+
+    Legacy "YYYYMMDD_HHMMSS.jpg" keys sort oldest-first, so whenever one
+    shows up the lexicographic-order shortcuts below don't hold and the
+    caller must order by LastModified instead.
+    """
+    prefix_len = len(camera_id) + 1
+    return any(not o['Key'][prefix_len:].startswith('0') for o in objects)
+
+def _list_all_objects(camera_id):
+    paginator = get_client().get_paginator('list_objects_v2')
+    objects = []
+    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=f"{camera_id}/",
+                                   PaginationConfig={'PageSize': 1000}):
+        objects.extend(page.get('Contents', []))
+    return objects
+
+def make_frame_key(camera_id):
+    """Object key for a new frame.
+
+    Embeds an inverted millisecond timestamp so S3's lexicographic
+    listing order is newest-first — "latest N" becomes a single bounded
+    list call with no client-side sort. The leading "0" makes every
+    new-format key sort ahead of legacy "YYYYMMDD_HHMMSS.jpg" keys still
+    present under the prefix.
+    """
+    inv_ts = (2**63 - 1) - int(time.time() * 1000)
+    return f"{camera_id}/0{inv_ts:019d}_{uuid4().hex}.jpg"
+
+# Running bucket-size counter for the optional MAX_STORAGE_GB quota.
+# Initialized with one paginated scan on first use, then kept current by
+# upload/delete deltas — the quota check is a pure integer compare
+# instead of a listing per frame. Disabled (None, never initialized)
+# unless MAX_STORAGE_GB is set.
+_bucket_bytes = None
+_bucket_lock = threading.Lock()
+
+def _bucket_usage():
+    global _bucket_bytes
+    with _bucket_lock:
+        if _bucket_bytes is None:
+            total = 0
+            paginator = get_client().get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=S3_BUCKET,
+                                           PaginationConfig={'PageSize': 1000}):
+                for obj in page.get('Contents', []):
+                    total += obj['Size']
+            _bucket_bytes = total
+            logger.info("bucket usage initialized: %d bytes", total)
+        return _bucket_bytes
+
+def _adjust_bucket_bytes(delta):
+    global _bucket_bytes
+    with _bucket_lock:
+        if _bucket_bytes is not None:
+            _bucket_bytes += delta
+
+def check_storage_limit(new_bytes=0):
+    """True if adding new_bytes keeps the bucket within MAX_STORAGE_GB.
+
+    Always True when no quota is configured; fails open if the initial
+    usage scan errors, so a transient S3 hiccup never drops frames.
+    """
+    if not MAX_STORAGE_GB or not get_client():
+        return True
+    try:
+        usage = _bucket_usage()
+    except ClientError as e:
+        logger.error("storage usage scan failed, allowing upload: %s", e)
+        return True
+    return usage + new_bytes <= MAX_STORAGE_GB * 1024 ** 3
+
+# Typical ESP32 frames stay well under the 8MB threshold and take the
+# single-PUT path; anything larger (e.g. high-res stills) is split into
+# parts uploaded over 4 concurrent connections
+_UPLOAD_CFG = TransferConfig(
+    multipart_threshold=8 * 1024 ** 2,
+    multipart_chunksize=8 * 1024 ** 2,
+    max_concurrency=4,
+    use_threads=True,
+)
+
+# Frames under this size aren't worth the decode/encode round-trip
+_RECOMPRESS_MIN_BYTES = 20 * 1024
+
+def _recompress_jpeg(fileobj):
+    """Re-encode a JPEG at RECOMPRESS_QUALITY to shave device-encoder
+    headroom (~20-30% of bytes). Falls back to the original stream if
+    Pillow is missing, the frame is small, or re-encoding doesn't help."""
+    data = fileobj.read()
+    if Image is None or len(data) < _RECOMPRESS_MIN_BYTES:
+        return io.BytesIO(data)
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        out = io.BytesIO()
+        img.save(out, format='JPEG', quality=RECOMPRESS_QUALITY, optimize=True)
+        if out.tell() < len(data):
+            logger.debug("recompressed %d -> %d bytes", len(data), out.tell())
+            out.seek(0)
+            return out
+    except Exception as e:
+        logger.warning("recompression failed, uploading original: %s", e)
+    return io.BytesIO(data)
+
+def upload_to_s3(source, filename):
+    """Stream file to S3 bucket - KEEPS ALL IMAGES, no deletion.
+
+    source may be a file-like object (streamed as-is), raw bytes, or a
+    filesystem path — callers holding a frame in memory or on disk don't
+    need to wrap it themselves.
+    """
+    client = get_client()
+    if not client:
         logger.error("S3 client not initialized")
         return False
-        
+
+    close_after = False
+    data = None
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        # Zero-copy view: small payloads go straight to put_object below
+        # without ever being duplicated into a BytesIO buffer
+        data = memoryview(source)
+        fileobj = None
+    elif isinstance(source, (str, os.PathLike)):
+        fileobj = open(source, 'rb')
+        close_after = True
+    else:
+        fileobj = source
+
+    if RECOMPRESS_UPLOADS:
+        recompressed = _recompress_jpeg(io.BytesIO(data) if data is not None else fileobj)
+        if close_after:
+            fileobj.close()
+            close_after = False
+        fileobj = recompressed
+        data = None
+
     try:
-        logger.info(f"📤 Uploading to S3: {filename}")
-        file_size = len(file_content)
-        logger.info(f"📏 File size: {file_size} bytes")
-        
-        response = s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=filename,
-            Body=file_content,
-            ContentType='image/jpeg',
-            Metadata={
-                'upload_time': datetime.utcnow().isoformat()
-            }
-        )
-        logger.info(f"✅ Upload successful to S3: {filename}")
+        # Quota enforcement only pays its costs (a seek and the one-time
+        # usage scan) when MAX_STORAGE_GB is configured
+        size = None
+        if MAX_STORAGE_GB:
+            if data is not None:
+                size = len(data)
+            elif fileobj.seekable():
+                pos = fileobj.tell()
+                size = fileobj.seek(0, 2) - pos
+                fileobj.seek(pos)
+            if size is not None and not check_storage_limit(size):
+                logger.warning("storage limit reached, dropping %s", filename)
+                return False
+
+        logger.debug("uploading to S3: %s", filename)
+        if data is not None and len(data) < _UPLOAD_CFG.multipart_threshold:
+            # In-memory payload below the multipart threshold: a single
+            # PUT with the memoryview as Body avoids the full-payload
+            # copy a BytesIO wrap would cost
+            client.put_object(
+                Bucket=S3_BUCKET,
+                Key=filename,
+                Body=data,
+                ContentType='image/jpeg',
+                Metadata={'upload_time': datetime.utcnow().isoformat()}
+            )
+        else:
+            if data is not None:
+                fileobj = io.BytesIO(data)
+            client.upload_fileobj(
+                fileobj,
+                S3_BUCKET,
+                filename,
+                ExtraArgs={
+                    'ContentType': 'image/jpeg',
+                    'Metadata': {
+                        'upload_time': datetime.utcnow().isoformat()
+                    }
+                },
+                Config=_UPLOAD_CFG
+            )
+        logger.debug("upload successful to S3: %s", filename)
+        if size:
+            _adjust_bucket_bytes(size)
+        _invalidate_listing(filename.split("/", 1)[0])
         return True
-    except ClientError as e:
+    except (ClientError, S3UploadFailedError) as e:
         logger.error(f"❌ S3 upload error: {e}")
         return False
+    finally:
+        if close_after:
+            fileobj.close()
+
+# A presigned URL stays valid for its whole expiration window, so
+# re-signing the same key on every dashboard render is wasted HMAC work.
+# Entries carry their own deadline and are only served while at least a
+# minute of validity remains; the cache TTL (half the default 12h window)
+# just bounds memory.
+_url_cache = TTLCache(maxsize=10000, ttl=21600)
+# TTLCache isn't thread-safe, and presigning now runs from executor threads
+_url_lock = threading.Lock()
+
+# Constant portion of the presign Params, built once — per call only the
+# Key varies, added via a single C-level dict() constructor
+_PRESIGN_BASE = {
+    'Bucket': S3_BUCKET,
+    'ResponseContentType': 'image/jpeg',
+}
+
+# SigV4 signing keys are derived from the secret + UTC date, so one
+# derivation serves a whole day of URLs
+_signing_keys = {}
+
+def _signing_key(datestamp):
+    key = _signing_keys.get(datestamp)
+    if key is None:
+        key = hmac.new(("AWS4" + S3_SECRET_KEY).encode(), datestamp.encode(), hashlib.sha256).digest()
+        for part in (S3_REGION, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        _signing_keys.clear()
+        _signing_keys[datestamp] = key
+    return key
+
+def _fast_presign(filename, expiration, content_type='image/jpeg'):
+    """Build a SigV4 query-string presigned GET without going through
+    boto3's generate_presigned_url (which re-resolves the endpoint and
+    runs the event/validation pipeline on every call)."""
+    amzdate = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    datestamp = amzdate[:8]
+    host = f"{S3_BUCKET}.s3.{S3_REGION}.amazonaws.com"
+    path = "/" + quote(filename, safe="/-._~")
+    scope = f"{datestamp}/{S3_REGION}/s3/aws4_request"
+
+    params = sorted([
+        ("X-Amz-Algorithm", "AWS4-HMAC-SHA256"),
+        ("X-Amz-Credential", f"{S3_ACCESS_KEY}/{scope}"),
+        ("X-Amz-Date", amzdate),
+        ("X-Amz-Expires", str(expiration)),
+        ("X-Amz-SignedHeaders", "host"),
+        ("response-content-type", content_type),
+    ])
+    query = "&".join(f"{quote(k, safe='')}={quote(v, safe='')}" for k, v in params)
+
+    canonical_request = "\n".join([
+        "GET", path, query, f"host:{host}\n", "host", "UNSIGNED-PAYLOAD",
+    ])
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256", amzdate, scope,
+        hashlib.sha256(canonical_request.encode()).hexdigest(),
+    ])
+    signature = hmac.new(_signing_key(datestamp), string_to_sign.encode(), hashlib.sha256).hexdigest()
+    return f"https://{host}{path}?{query}&X-Amz-Signature={signature}"
 
 def get_presigned_url(filename, expiration=43200):
     """Generate presigned URL for S3 object — valid for 12 hours"""
-    if not s3_client:
+    client = get_client()
+    if not client:
         logger.error("S3 client not initialized")
         return None
-        
+
+    cache_key = (filename, expiration)
+    with _url_lock:
+        hit = _url_cache.get(cache_key)
+    if hit and hit[1] > time.time() + 60:
+        return hit[0]
+
+    if USE_FAST_SIGNER:
+        try:
+            url = _fast_presign(filename, expiration)
+            with _url_lock:
+                _url_cache[cache_key] = (url, time.time() + expiration)
+            return url
+        except Exception as e:
+            logger.warning("fast signer failed, falling back to boto3: %s", e)
+
     try:
-        logger.info(f"🔗 Generating presigned URL for: {filename}")
-        url = s3_client.generate_presigned_url(
+        logger.debug("generating presigned URL for: %s", filename)
+        url = client.generate_presigned_url(
             'get_object',
+            Params=dict(_PRESIGN_BASE, Key=filename),
+            ExpiresIn=expiration
+        )
+        with _url_lock:
+            _url_cache[cache_key] = (url, time.time() + expiration)
+        return url
+    except ClientError as e:
+        logger.error(f"❌ Presigned URL error for {filename}: {e}")
+        return None
+
+def get_presigned_put(filename, expiration=3600, content_type='image/jpeg'):
+    """Generate presigned PUT URL so a device can upload straight to S3"""
+    client = get_client()
+    if not client:
+        logger.error("S3 client not initialized")
+        return None
+
+    try:
+        return client.generate_presigned_url(
+            'put_object',
             Params={
-                'Bucket': S3_BUCKET, 
+                'Bucket': S3_BUCKET,
                 'Key': filename,
-                'ResponseContentType': 'image/jpeg'
+                'ContentType': content_type
             },
             ExpiresIn=expiration
         )
-        logger.info(f"✅ Generated URL successfully")
-        return url
     except ClientError as e:
-        logger.error(f"❌ Presigned URL error for {filename}: {e}")
+        logger.error(f"❌ Presigned PUT error for {filename}: {e}")
         return None
 
 def list_camera_images(camera_id, max_images=6):
     """
-    List images for a camera from S3, sorted newest first.
-    Uses paginator to handle buckets with more than 1000 images.
+    List the newest images for a camera with one bounded S3 request.
+
+    Upload keys embed an inverted millisecond timestamp, so S3's
+    lexicographic order is already newest-first — no pagination over the
+    whole prefix and no client-side sort. Concurrent cache misses for
+    the same key wait on a single fetch instead of each hitting S3.
     """
-    if not s3_client:
+    if not get_client():
         logger.error("S3 client not initialized")
         return []
-        
+
+    cache_key = (camera_id, max_images)
+    while True:
+        with _list_lock:
+            cached = _list_cache.get(cache_key)
+            if cached is not None:
+                return cached
+            fetch_event = _list_inflight.get(cache_key)
+            if fetch_event is None:
+                # We're the fetcher for this key
+                fetch_event = threading.Event()
+                _list_inflight[cache_key] = fetch_event
+                break
+        # Another thread is already fetching; wait and re-check the
+        # cache (looping also covers the fetcher failing, in which case
+        # a waiter takes over)
+        fetch_event.wait(timeout=10)
+
+    try:
+        return _fetch_camera_images(camera_id, max_images, cache_key)
+    finally:
+        with _list_lock:
+            _list_inflight.pop(cache_key, None)
+        fetch_event.set()
+
+def _fetch_camera_images(camera_id, max_images, cache_key):
     try:
-        logger.info(f"📋 Listing images for camera: {camera_id}")
-        
-        paginator = s3_client.get_paginator('list_objects_v2')
-        pages = paginator.paginate(
+        logger.debug("listing images for camera: %s", camera_id)
+
+        response = get_client().list_objects_v2(
             Bucket=S3_BUCKET,
-            Prefix=f"{camera_id}/"
+            Prefix=f"{camera_id}/",
+            MaxKeys=max_images
         )
+        objects = response.get('Contents', [])
 
-        all_objects = []
-        for page in pages:
-            if 'Contents' in page:
-                all_objects.extend(page['Contents'])
+        if _has_legacy_keys(camera_id, objects):
+            # Pre-series keys in the first page mean lexicographic order
+            # isn't newest-first here; fall back to listing the prefix
+            # and sorting by LastModified so dormant cameras don't show
+            # their oldest frames as the latest
+            objects = sorted(_list_all_objects(camera_id),
+                             key=itemgetter('LastModified'),
+                             reverse=True)[:max_images]
 
-        if not all_objects:
-            logger.info(f"No images found for camera: {camera_id}")
+        if not objects:
+            logger.debug("no images found for camera: %s", camera_id)
+            with _list_lock:
+                _list_cache[cache_key] = []
             return []
 
-        logger.info(f"Found {len(all_objects)} total images for {camera_id}")
-
-        # Sort by LastModified DESCENDING — newest first
-        objects = sorted(
-            all_objects,
-            key=lambda x: x['LastModified'],
-            reverse=True
-        )
+        # Each presign is independent CPU-bound SigV4 work (boto3 clients
+        # are thread-safe), so sign the cache misses in parallel instead
+        # of paying the per-URL cost serially
+        with ThreadPoolExecutor(max_workers=min(len(objects), 16)) as ex:
+            urls = list(ex.map(get_presigned_url, [o['Key'] for o in objects]))
 
         images = []
-        for i, obj in enumerate(objects[:max_images]):
-            url = get_presigned_url(obj['Key'])
+        for i, (obj, url) in enumerate(zip(objects, urls)):
             if url:
                 image_data = {
                     'key': obj['Key'],
                     'url': url,
-                    'timestamp': obj['LastModified'].isoformat(),
+                    # Epoch seconds: the C-level .timestamp() beats
+                    # isoformat()'s per-object string build, and the
+                    # dashboard feeds it straight into Date()
+                    'timestamp': obj['LastModified'].timestamp(),
                     'size': obj['Size'],
                     'display_order': i + 1
                 }
                 images.append(image_data)
-                logger.info(f"✅ Display image {i+1}: {obj['Key']}")
+                # Per-item in the hottest loop: isEnabledFor keeps even
+                # the LogRecord construction off the production path
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("display image %d: %s", i + 1, obj['Key'])
             else:
-                logger.error(f"❌ Failed to generate URL for {obj['Key']}")
+                logger.error("failed to generate URL for %s", obj['Key'])
 
-        logger.info(f"Returning {len(images)} images for display for {camera_id}")
+        logger.debug("returning %d images for %s", len(images), camera_id)
+        with _list_lock:
+            _list_cache[cache_key] = images
         return images
-        
+
     except ClientError as e:
         logger.error(f"❌ S3 list error for {camera_id}: {e}")
         return []
+
+def delete_old_images(camera_id, keep_count=100):
+    """
+    Retention sweep: keep the newest keep_count images for a camera and
+    delete the rest, up to 1000 keys per delete_objects request.
+
+    Not called from the upload path — the server keeps all images unless
+    a deployment runs this explicitly.
+    """
+    client = get_client()
+    if not client:
+        logger.error("S3 client not initialized")
+        return 0
+
+    try:
+        # Keys are newest-first (inverted-timestamp scheme), so the first
+        # keep_count keys under the prefix are exactly the keepers. List
+        # just those, then restart the scan after the last keeper with
+        # StartAfter — only the deletion candidates' metadata crosses the
+        # wire, instead of re-listing the frames being kept.
+        paginator = client.get_paginator('list_objects_v2')
+        kept = []
+        for page in paginator.paginate(
+            Bucket=S3_BUCKET,
+            Prefix=f"{camera_id}/",
+            PaginationConfig={'MaxItems': keep_count, 'PageSize': 1000}
+        ):
+            kept.extend(page.get('Contents', []))
+
+        if len(kept) < keep_count:
+            return 0
+
+        to_delete = []
+        sizes = {}
+        if _has_legacy_keys(camera_id, kept):
+            # Legacy keys among the would-be keepers invert the ordering
+            # assumption — trusting it here would keep the oldest frames
+            # and delete the newest. Order the whole prefix by
+            # LastModified instead and drop everything past keep_count.
+            candidates = sorted(_list_all_objects(camera_id),
+                                key=itemgetter('LastModified'),
+                                reverse=True)[keep_count:]
+            for obj in candidates:
+                to_delete.append({'Key': obj['Key']})
+                sizes[obj['Key']] = obj['Size']
+        else:
+            pages = paginator.paginate(
+                Bucket=S3_BUCKET,
+                Prefix=f"{camera_id}/",
+                StartAfter=kept[-1]['Key'],
+                # Max page size — a prefix with tens of thousands of
+                # frames is scanned in as few round-trips as the API
+                # allows
+                PaginationConfig={'PageSize': 1000}
+            )
+            for page in pages:
+                for obj in page.get('Contents', []):
+                    to_delete.append({'Key': obj['Key']})
+                    sizes[obj['Key']] = obj['Size']
+
+        deleted = 0
+        for i in range(0, len(to_delete), 1000):
+            batch = to_delete[i:i + 1000]
+            response = client.delete_objects(
+                Bucket=S3_BUCKET,
+                Delete={'Objects': batch, 'Quiet': True}
+            )
+            # Quiet mode still reports per-key failures
+            errors = response.get('Errors', [])
+            failed = set()
+            for err in errors:
+                failed.add(err.get('Key'))
+                logger.error("failed to delete %s: %s (%s)",
+                             err.get('Key'), err.get('Message'), err.get('Code'))
+            deleted += len(batch) - len(errors)
+            _adjust_bucket_bytes(-sum(
+                sizes[o['Key']] for o in batch if o['Key'] not in failed
+            ))
+
+        if deleted:
+            _invalidate_listing(camera_id)
+            logger.info("deleted %d old images for %s", deleted, camera_id)
+        return deleted
+
+    except ClientError as e:
+        logger.error(f"❌ S3 delete error for {camera_id}: {e}")
+        return 0